@@ -1,25 +1,18 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
 from typing import Any, Mapping, Optional, cast
 import shutil
 
 import chess
 import chess.engine
 
-
-@dataclass(frozen=True)
-class LineSuggestion:
-    move_uci: str
-    move_san: str
-    score_cp: int | None
-
-
-@dataclass(frozen=True)
-class SuggestionPack:
-    mode: str
-    think_ms: int
-    lines: list[LineSuggestion]
+from suggestions import (
+    LineSuggestion,
+    SuggestionPack,
+    configure_strength,
+    lines_from_infos,
+    score_to_cp,
+)
 
 
 def find_stockfish(path: str | None) -> str:
@@ -34,40 +27,6 @@ def find_stockfish(path: str | None) -> str:
     return exe
 
 
-def configure_strength(engine: chess.engine.SimpleEngine, elo: int) -> str:
-    if "UCI_LimitStrength" in engine.options:
-        engine.configure({"UCI_LimitStrength": True})
-
-    if "UCI_Elo" in engine.options:
-        opt = engine.options["UCI_Elo"]
-        min_elo = getattr(opt, "min", None)
-        max_elo = getattr(opt, "max", None)
-
-        applied = elo
-        if min_elo is not None:
-            applied = max(applied, int(min_elo))
-        if max_elo is not None:
-            applied = min(applied, int(max_elo))
-
-        engine.configure({"UCI_Elo": applied})
-        return f"UCI_Elo={applied}"
-
-    if "Skill Level" in engine.options:
-        skill = 5
-        engine.configure({"Skill Level": skill})
-        return f"Skill Level={skill}"
-
-    return "default (no strength options)"
-
-
-def score_to_cp(info_score: chess.engine.PovScore | None, turn: bool) -> int | None:
-    if info_score is None:
-        return None
-    s = info_score.pov(turn)
-    val = s.score(mate_score=100000)
-    return int(val) if val is not None else None
-
-
 def normalize_san(s: str) -> str:
     s = s.strip()
     s = s.replace("0-0-0", "O-O-O").replace("0-0", "O-O")
@@ -112,21 +71,7 @@ def suggest_topk(
         limit = chess.engine.Limit(time=think_ms / 1000.0)
 
         infos = engine.analyse(board, limit, multipv=k) if k > 1 else [engine.analyse(board, limit)]
-        infos = sorted(infos, key=lambda d: d.get("multipv", 1))
-
-        lines: list[LineSuggestion] = []
-        for info in infos:
-            pv = info.get("pv")
-            if not pv:
-                continue
-            move = pv[0]
-            lines.append(
-                LineSuggestion(
-                    move_uci=move.uci(),
-                    move_san=board.san(move),
-                    score_cp=score_to_cp(info.get("score"), board.turn),
-                )
-            )
+        lines = lines_from_infos(board, infos)
 
         return SuggestionPack(mode=mode, think_ms=think_ms, lines=lines)
 
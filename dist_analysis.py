@@ -0,0 +1,511 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from chess_core import find_stockfish
+from engine_pool import AnalysisCache
+from suggestions import SuggestionPack, analyse_board, configure_strength, pack_from_dict
+
+# Распределённый анализ: координатор держит очередь задач (FEN + think_ms +
+# multipv + elo), воркеры на любых машинах подключаются по TCP, сообщают capacity
+# (сколько движков держат) и забирают задачи. Протокол — как у hint_daemon:
+# одна строка JSON на запрос, одна на ответ, соединение воркера постоянное.
+#
+# Задача выдаётся в аренду (lease) на lease_s секунд; любое сообщение воркера
+# продлевает аренду всех его задач, поэтому срок аренды хранится на воркера,
+# а не на задачу. Обрыв соединения или истёкшая аренда возвращают задачи
+# воркера в очередь, после max_attempts попыток задача падает.
+# Одинаковые позиции (по Zobrist-хэшу) считаются один раз; готовые результаты
+# держатся в LRU на results_cache_size позиций.
+
+MAX_PULL_WAIT_S = 5.0
+RESULTS_CACHE_SIZE = 100_000
+
+
+@dataclass
+class _Job:
+    id: int
+    key: tuple[int, int, int, int | None]  # (zobrist, think_ms, multipv, elo)
+    fen: str
+    think_ms: int
+    multipv: int
+    elo: int | None
+    future: Future[SuggestionPack]
+    attempts: int = 0
+    worker: str | None = None
+
+
+class Coordinator:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        lease_s: float = 30.0,
+        max_attempts: int = 3,
+        results_cache_size: int = RESULTS_CACHE_SIZE,
+    ) -> None:
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self._cond = threading.Condition()
+        self._jobs: dict[int, _Job] = {}
+        # id задач в очереди; завершённые, пока стояли в ней, пропускаются при выдаче
+        self._queue: deque[int] = deque()
+        # воркер -> id арендованных им задач и срок его аренды
+        self._leases: dict[str, set[int]] = {}
+        self._lease_until: dict[str, float] = {}
+        self._by_key: dict[tuple[int, int, int, int | None], _Job] = {}
+        self._results = AnalysisCache(results_cache_size)
+        self._workers: dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._closed = False
+        self.server = _CoordinatorServer((host, port), self)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.server.server_address[:2]
+
+    def start(self) -> None:
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        with self._cond:
+            self._closed = True
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+            self._queue.clear()
+            self._leases.clear()
+            self._by_key.clear()
+            self._cond.notify_all()
+        for job in jobs:
+            job.future.set_exception(RuntimeError("Координатор остановлен"))
+
+    def workers(self) -> dict[str, int]:
+        """
+        Подключённые воркеры и их capacity.
+        """
+        with self._cond:
+            return dict(self._workers)
+
+    def submit(
+        self,
+        fen: str,
+        think_ms: int = 200,
+        multipv: int = 3,
+        elo: int | None = None,
+    ) -> Future[SuggestionPack]:
+        """
+        elo=None — полная сила движка (обычно то, что нужно для разметки партий).
+        """
+        board = chess.Board(fen)
+        key = (chess.polyglot.zobrist_hash(board), think_ms, multipv, elo)
+
+        with self._cond:
+            pack = self._results.get(key)
+            if pack is not None:
+                fut: Future[SuggestionPack] = Future()
+                fut.set_result(pack)
+                return fut
+            job = self._by_key.get(key)
+            if job is not None:
+                return job.future
+
+            job = _Job(
+                id=next(self._ids),
+                key=key,
+                fen=fen,  # уже проверен chess.Board; board.fen() заметно дороже
+                think_ms=think_ms,
+                multipv=multipv,
+                elo=elo,
+                future=Future(),
+            )
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._queue.append(job.id)
+            self._cond.notify_all()
+            return job.future
+
+    def analyse_many(
+        self,
+        fens: list[str],
+        think_ms: int = 200,
+        multipv: int = 3,
+        elo: int | None = None,
+    ) -> list[SuggestionPack]:
+        futures = [self.submit(fen, think_ms, multipv, elo) for fen in fens]
+        return [fut.result() for fut in futures]
+
+    # --- вызывается из обработчика соединения воркера
+
+    def _register(self, worker: str, capacity: int) -> None:
+        with self._cond:
+            self._workers[worker] = capacity
+
+    def _pull(self, worker: str, max_jobs: int, wait_s: float) -> list[_Job]:
+        deadline = time.monotonic() + min(wait_s, MAX_PULL_WAIT_S)
+        with self._cond:
+            while not self._has_queued_locked() and not self._closed:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+
+            self._touch_locked(worker)
+            leased = self._leases.setdefault(worker, set())
+            jobs: list[_Job] = []
+            while len(jobs) < max_jobs and self._has_queued_locked():
+                job = self._jobs[self._queue.popleft()]
+                job.attempts += 1
+                job.worker = worker
+                leased.add(job.id)
+                jobs.append(job)
+            return jobs
+
+    def _has_queued_locked(self) -> bool:
+        while self._queue and self._queue[0] not in self._jobs:
+            self._queue.popleft()
+        return bool(self._queue)
+
+    def _touch(self, worker: str) -> None:
+        with self._cond:
+            self._touch_locked(worker)
+
+    def _touch_locked(self, worker: str) -> None:
+        self._lease_until[worker] = time.monotonic() + self.lease_s
+
+    def _complete(self, worker: str, job_id: int, pack: SuggestionPack) -> None:
+        with self._cond:
+            self._touch_locked(worker)
+            # опоздавший дубликат: задачу уже закрыл другой воркер
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return
+            if job.worker is not None:
+                self._leases[job.worker].discard(job_id)
+            del self._by_key[job.key]
+            self._results.put(job.key, pack)
+        job.future.set_result(pack)
+
+    def _fail(self, worker: str, job_id: int, error: str) -> None:
+        with self._cond:
+            self._touch_locked(worker)
+            job = self._jobs.get(job_id)
+            if job is None or job.worker != worker:
+                return
+            failed = self._requeue_locked([job], error)
+        _fail_jobs(failed)
+
+    def _drop_worker(self, worker: str) -> None:
+        with self._cond:
+            self._workers.pop(worker, None)
+            self._lease_until.pop(worker, None)
+            jobs = [self._jobs[job_id] for job_id in self._leases.pop(worker, ())]
+            failed = self._requeue_locked(jobs, f"воркер {worker} отключился")
+        _fail_jobs(failed)
+
+    def _requeue_locked(self, jobs: list[_Job], reason: str) -> list[tuple[_Job, str]]:
+        failed: list[tuple[_Job, str]] = []
+        for job in jobs:
+            if job.worker in self._leases:
+                self._leases[job.worker].discard(job.id)
+            job.worker = None
+            if job.attempts >= self.max_attempts:
+                del self._jobs[job.id]
+                del self._by_key[job.key]
+                failed.append((job, f"{reason} (попыток: {job.attempts})"))
+            else:
+                self._queue.appendleft(job.id)
+        self._cond.notify_all()
+        return failed
+
+    def _reap(self) -> None:
+        period = max(0.2, self.lease_s / 4)
+        while True:
+            time.sleep(period)
+            now = time.monotonic()
+            with self._cond:
+                if self._closed:
+                    return
+                expired: list[_Job] = []
+                for worker, until in list(self._lease_until.items()):
+                    if until < now:
+                        del self._lease_until[worker]
+                        expired += [self._jobs[job_id] for job_id in self._leases.pop(worker, ())]
+                failed = self._requeue_locked(expired, "аренда истекла") if expired else []
+            _fail_jobs(failed)
+
+
+def _fail_jobs(failed: list[tuple[_Job, str]]) -> None:
+    for job, reason in failed:
+        job.future.set_exception(RuntimeError(f"Анализ {job.fen} не удался: {reason}"))
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple[str, int], coordinator: Coordinator) -> None:
+        self.coordinator = coordinator
+        super().__init__(address, _WorkerHandler)
+
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    server: _CoordinatorServer
+
+    def handle(self) -> None:
+        coord = self.server.coordinator
+        worker: str | None = None
+        try:
+            for raw in self.rfile:
+                msg = json.loads(raw)
+                op = msg.get("op")
+
+                if op == "register":
+                    worker = str(msg["worker"])
+                    coord._register(worker, int(msg.get("capacity", 1)))
+                    resp: dict = {"lease_s": coord.lease_s}
+                elif worker is None:
+                    resp = {"error": "Сначала register"}
+                elif op == "pull":
+                    jobs = coord._pull(worker, int(msg.get("max", 1)), float(msg.get("wait", 0)))
+                    resp = {
+                        "jobs": [
+                            {"id": j.id, "fen": j.fen, "think_ms": j.think_ms, "multipv": j.multipv, "elo": j.elo}
+                            for j in jobs
+                        ]
+                    }
+                elif op == "result":
+                    coord._complete(worker, int(msg["id"]), pack_from_dict(msg["pack"]))
+                    resp = {"ok": True}
+                elif op == "fail":
+                    coord._fail(worker, int(msg["id"]), str(msg.get("error", "")))
+                    resp = {"ok": True}
+                elif op == "heartbeat":
+                    coord._touch(worker)
+                    resp = {"ok": True}
+                else:
+                    resp = {"error": f"Неизвестная операция: {op}"}
+
+                self.wfile.write(json.dumps(resp).encode("utf-8") + b"\n")
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        finally:
+            if worker is not None:
+                coord._drop_worker(worker)
+
+
+class _Connection:
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self._rfile = sock.makefile("rb")
+
+    def call(self, msg: dict) -> dict:
+        self._sock.sendall(json.dumps(msg).encode("utf-8") + b"\n")
+        raw = self._rfile.readline()
+        if not raw:
+            raise ConnectionError("Координатор закрыл соединение")
+        resp = json.loads(raw)
+        if "error" in resp:
+            raise RuntimeError(resp["error"])
+        return resp
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._sock.close()
+
+
+def _connect(host: str, port: int, timeout: float) -> socket.socket:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((host, port))
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def run_worker(
+    host: str,
+    port: int,
+    engine_path: str | None = None,
+    capacity: int = 1,
+    worker_id: str | None = None,
+    connect_timeout: float = 30.0,
+) -> None:
+    """
+    Держит capacity движков и обрабатывает задачи координатора, пока тот
+    не закроет соединение. Силу движка задаёт каждая задача.
+    """
+    if capacity < 1:
+        raise ValueError(f"capacity должна быть >= 1, а не {capacity}")
+    path = find_stockfish(engine_path)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    # слот: (движок, на какой Elo настроен, mode); (None, None, причина) —
+    # слот потерян, воркер завершается
+    engines: queue.Queue[tuple[chess.engine.SimpleEngine | None, int | None, str]] = queue.Queue()
+    broken = threading.Event()
+    for _ in range(capacity):
+        engine = chess.engine.SimpleEngine.popen_uci(path)
+        engines.put((engine, None, configure_strength(engine, None)))
+
+    def analyse(job: dict) -> SuggestionPack:
+        engine, elo, mode = engines.get()
+        if engine is None:
+            engines.put((engine, elo, mode))
+            raise RuntimeError(mode)
+        try:
+            if job["elo"] != elo:
+                elo, mode = job["elo"], configure_strength(engine, job["elo"])
+            board = chess.Board(job["fen"])
+            pack = analyse_board(engine, board, mode, job["think_ms"], job["multipv"])
+        except chess.engine.EngineError:
+            # слот не теряем: поднимаем движок заново, задачу пусть повторят
+            try:
+                engine.quit()
+            except Exception:
+                pass
+            try:
+                engine = chess.engine.SimpleEngine.popen_uci(path)
+                mode = configure_strength(engine, None)
+            except Exception as e:
+                broken.set()
+                engines.put((None, None, f"Движок не перезапустился: {e}"))
+                raise
+            engines.put((engine, None, mode))
+            raise
+        except Exception:
+            engines.put((engine, elo, mode))
+            raise
+        engines.put((engine, elo, mode))
+        return pack
+
+    conn = _Connection(_connect(host, port, connect_timeout))
+    executor = ThreadPoolExecutor(max_workers=capacity, thread_name_prefix="worker")
+    inflight: dict[Future[SuggestionPack], int] = {}
+    try:
+        lease_s = float(conn.call({"op": "register", "worker": worker_id, "capacity": capacity})["lease_s"])
+        idle_wait = min(MAX_PULL_WAIT_S, lease_s / 3)
+
+        while True:
+            for fut in [f for f in inflight if f.done()]:
+                job_id = inflight.pop(fut)
+                try:
+                    pack = fut.result()
+                except Exception as e:
+                    conn.call({"op": "fail", "id": job_id, "error": str(e)})
+                else:
+                    conn.call({"op": "result", "id": job_id, "pack": asdict(pack)})
+
+            # без движка работать нечем: отключаемся, координатор раздаст
+            # наши задачи другим воркерам
+            if broken.is_set():
+                break
+
+            free = capacity - len(inflight)
+            if free:
+                resp = conn.call({"op": "pull", "max": free, "wait": 0.25 if inflight else idle_wait})
+                for job in resp["jobs"]:
+                    inflight[executor.submit(analyse, job)] = job["id"]
+
+            if inflight:
+                done, _ = wait(inflight, timeout=0 if free else lease_s / 3, return_when=FIRST_COMPLETED)
+                if not done and not free:
+                    conn.call({"op": "heartbeat"})
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        conn.close()
+        # ждём идущие поиски, чтобы все движки вернулись в очередь и закрылись
+        executor.shutdown(wait=True, cancel_futures=True)
+        while not engines.empty():
+            engine, _, _ = engines.get()
+            if engine is None:
+                continue
+            try:
+                engine.quit()
+            except Exception:
+                pass
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Распределённый анализ позиций (координатор/воркеры)")
+    sub = ap.add_subparsers(dest="role", required=True)
+
+    co = sub.add_parser("coordinator", help="Раздать позиции из файла воркерам")
+    co.add_argument("--host", default="127.0.0.1", help="Адрес для воркеров (0.0.0.0 — все интерфейсы)")
+    co.add_argument("--port", type=int, default=5555)
+    co.add_argument("--fens", default="-", help="Файл с FEN по одному в строке ('-' — stdin)")
+    co.add_argument("--think-ms", type=int, default=200, help="Время на позицию в мс")
+    co.add_argument("--topk", type=int, default=3, help="Сколько вариантов (MultiPV)")
+    co.add_argument("--elo", type=int, default=None, help="Сила движка (по умолчанию полная)")
+    co.add_argument("--lease-s", type=float, default=30.0, help="Аренда задачи воркером, с")
+    co.add_argument("--max-attempts", type=int, default=3, help="Попыток на задачу")
+
+    wo = sub.add_parser("worker", help="Подключиться к координатору и анализировать")
+    wo.add_argument("--host", default="127.0.0.1")
+    wo.add_argument("--port", type=int, default=5555)
+    wo.add_argument("--engine", default=None, help="Путь к stockfish (если не в PATH)")
+    wo.add_argument("--capacity", type=int, default=1, help="Сколько движков держать")
+
+    args = ap.parse_args()
+
+    if args.role == "worker":
+        if args.capacity < 1:
+            ap.error("--capacity должна быть >= 1")
+        try:
+            run_worker(args.host, args.port, args.engine, args.capacity)
+        except RuntimeError as e:  # движок не найден
+            ap.exit(1, f"{e}\n")
+        return
+
+    if args.fens == "-":
+        fens = [line.strip() for line in sys.stdin if line.strip()]
+    else:
+        with open(args.fens, encoding="utf-8") as f:
+            fens = [line.strip() for line in f if line.strip()]
+
+    coord = Coordinator(args.host, args.port, args.lease_s, args.max_attempts)
+    coord.start()
+    print(f"[coordinator] {coord.address[0]}:{coord.address[1]}, позиций: {len(fens)}", file=sys.stderr)
+    try:
+        futures: list[Future[SuggestionPack]] = []
+        for fen in fens:
+            try:
+                futures.append(coord.submit(fen, args.think_ms, args.topk, args.elo))
+            except ValueError as e:
+                fut: Future[SuggestionPack] = Future()
+                fut.set_exception(e)
+                futures.append(fut)
+
+        for fen, fut in zip(fens, futures):
+            try:
+                out = {"fen": fen, **asdict(fut.result())}
+            except (RuntimeError, ValueError) as e:
+                out = {"fen": fen, "error": str(e)}
+            print(json.dumps(out, ensure_ascii=False), flush=True)
+    finally:
+        coord.close()
+
+
+if __name__ == "__main__":
+    main()
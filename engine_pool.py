@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+import chess
+import chess.engine
+
+from suggestions import SuggestionPack, analyse_board, configure_strength
+
+# Общие для демона подсказок, Streamlit-UI и dist_analysis строительные блоки
+# без зависимостей от платформы (Unix-сокеты и fcntl — только в hint_daemon).
+
+CACHE_SIZE = 512
+MAX_ENGINES = 4
+
+
+class AnalysisCache:
+    """
+    LRU-кэш SuggestionPack. Ключ у демона — (fen, engine, elo, think_ms, k),
+    у dist_analysis — (zobrist, think_ms, multipv).
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[tuple, SuggestionPack] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> SuggestionPack | None:
+        with self._lock:
+            pack = self._data.get(key)
+            if pack is not None:
+                self._data.move_to_end(key)
+            return pack
+
+    def put(self, key: tuple, pack: SuggestionPack) -> None:
+        with self._lock:
+            self._data[key] = pack
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class _PooledEngine:
+    """
+    Движок пула. Всё, кроме самого объекта, меняется только под lock:
+    elo/mode — на какую силу движок сейчас настроен, closed — вытеснен
+    из пула или умер.
+    """
+
+    def __init__(self, engine: chess.engine.SimpleEngine) -> None:
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.elo: int | None = None
+        self.mode: str | None = None
+        self.closed = False
+
+
+class EnginePool:
+    """
+    По одному запущенному движку на путь, не больше max_engines: самый давно
+    не использованный движок закрывается. Силу настраивает тот, кто держит
+    лок движка (WarmAnalyzer), поэтому смена Elo новых процессов не плодит.
+    """
+
+    def __init__(self, max_engines: int = MAX_ENGINES) -> None:
+        self.max_engines = max_engines
+        self._engines: OrderedDict[str, _PooledEngine] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> _PooledEngine:
+        evicted: list[_PooledEngine] = []
+        with self._lock:
+            entry = self._engines.get(path)
+            if entry is None:
+                entry = _PooledEngine(chess.engine.SimpleEngine.popen_uci(path))
+                self._engines[path] = entry
+            self._engines.move_to_end(path)
+            while len(self._engines) > self.max_engines:
+                evicted.append(self._engines.popitem(last=False)[1])
+        # идущий на вытесненном движке поиск сначала доработает
+        for old in evicted:
+            with old.lock:
+                _close(old)
+        return entry
+
+    def drop(self, path: str, entry: _PooledEngine) -> None:
+        """
+        Убирает сломанный движок; вызывающий держит entry.lock.
+        """
+        with self._lock:
+            if self._engines.get(path) is entry:
+                del self._engines[path]
+        _close(entry)
+
+    def close(self) -> None:
+        with self._lock:
+            entries = list(self._engines.values())
+            self._engines.clear()
+        for entry in entries:
+            with entry.lock:
+                _close(entry)
+
+
+def _close(entry: _PooledEngine) -> None:
+    entry.closed = True
+    _quit(entry.engine)
+
+
+def _quit(engine: chess.engine.SimpleEngine) -> None:
+    try:
+        engine.quit()
+    except Exception:
+        pass
+
+
+class WarmAnalyzer:
+    """
+    Тёплые движки + кэш анализа. Потокобезопасен; используется демоном
+    и фоновыми задачами Streamlit-UI. path — уже найденный путь к движку.
+    """
+
+    def __init__(self, cache_size: int = CACHE_SIZE, max_engines: int = MAX_ENGINES) -> None:
+        self.pool = EnginePool(max_engines)
+        self.cache = AnalysisCache(cache_size)
+
+    def suggest(self, fen: str, path: str, elo: int, think_ms: int, k: int) -> SuggestionPack:
+        board = chess.Board(fen)
+        if board.is_game_over():
+            raise ValueError(f"Партия уже закончина: {board.result()}")
+
+        key = (board.fen(), path, elo, think_ms, k)
+        pack = self.cache.get(key)
+        if pack is not None:
+            return pack
+
+        with self._engine(path, elo) as (engine, mode):
+            pack = analyse_board(engine, board, mode, think_ms, k)
+        self.cache.put(key, pack)
+        return pack
+
+    def play(self, fen: str, path: str, elo: int, think_ms: int) -> tuple[str, chess.Move, str]:
+        """
+        Возвращает (mode, move, san), как chess_core.engine_reply_move.
+        """
+        board = chess.Board(fen)
+        with self._engine(path, elo) as (engine, mode):
+            result = engine.play(board, chess.engine.Limit(time=think_ms / 1000.0))
+        return mode, result.move, board.san(result.move)
+
+    @contextmanager
+    def _engine(self, path: str, elo: int) -> Iterator[tuple[chess.engine.SimpleEngine, str]]:
+        while True:
+            entry = self.pool.get(path)
+            entry.lock.acquire()
+            if not entry.closed:
+                break
+            # движок вытеснили из пула, пока мы ждали его лок
+            entry.lock.release()
+        try:
+            if entry.mode is None or entry.elo != elo:
+                entry.mode = configure_strength(entry.engine, elo)
+                entry.elo = elo
+            yield entry.engine, entry.mode
+        except chess.engine.EngineError:
+            # движок умер или сломался: следующий запрос поднимет новый
+            self.pool.drop(path, entry)
+            raise
+        finally:
+            entry.lock.release()
+
+    def close(self) -> None:
+        self.pool.close()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+import chess
+import chess.engine
+
+from chess_core import find_stockfish
+from suggestions import LineSuggestion, SuggestionPack, configure_strength, lines_from_infos
+
+# Анализ одной позиции несколькими UCI-движками (или одним движком в разных
+# настройках) параллельно, с объединением MultiPV в один SuggestionPack.
+
+
+@dataclass(frozen=True)
+class EngineSpec:
+    """
+    Участник ансамбля. path=None — stockfish из PATH, elo=None — полная сила,
+    think_ms=None — общее время ensemble_suggest.
+    """
+    name: str
+    path: str | None = None
+    elo: int | None = None
+    think_ms: int | None = None
+    options: Mapping[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class EngineResult:
+    name: str
+    mode: str
+    elapsed_ms: int
+    lines: list[LineSuggestion]
+
+
+@dataclass(frozen=True)
+class EnsembleLine(LineSuggestion):
+    # оценка каждого движка, у которого ход попал в топ-k (cp, со стороны хода)
+    engine_scores: dict[str, int | None]
+    votes: int
+
+
+@dataclass(frozen=True)
+class EnsemblePack(SuggestionPack):
+    engines: list[EngineResult]
+    timed_out: list[str]
+    failed: dict[str, str]
+    # доля успевших движков, чей лучший ход совпал с лучшим ходом ансамбля
+    top_agreement: float
+    # средний по парам движков коэффициент Жаккара их топ-k
+    overlap: float
+
+
+class _Member:
+    """
+    Один движок ансамбля. abort() можно вызвать из другого потока: идущий
+    поиск получает stop, а движок, который ещё запускается, закрывается.
+    """
+
+    def __init__(self, spec: EngineSpec) -> None:
+        self.spec = spec
+        self._engine: chess.engine.SimpleEngine | None = None
+        self._analysis: chess.engine.SimpleAnalysisResult | None = None
+        self._aborted = False
+        self._lock = threading.Lock()
+
+    def run(self, board: chess.Board, think_ms: int, k: int) -> EngineResult:
+        start = time.monotonic()
+        engine = chess.engine.SimpleEngine.popen_uci(find_stockfish(self.spec.path))
+        with self._lock:
+            self._engine = engine
+            aborted = self._aborted
+        # abort() пришёл, пока движок запускался: не настраиваем и не ищем
+        if aborted:
+            engine.close()
+            raise TimeoutError(self.spec.name)
+
+        with engine:
+            if self.spec.options:
+                engine.configure(dict(self.spec.options))
+            mode = "full strength" if self.spec.elo is None else configure_strength(engine, self.spec.elo)
+
+            limit = chess.engine.Limit(time=(self.spec.think_ms or think_ms) / 1000.0)
+            with engine.analysis(board, limit, multipv=k) as analysis:
+                with self._lock:
+                    self._analysis = analysis
+                    aborted = self._aborted
+                if aborted:
+                    analysis.stop()
+                analysis.wait()
+                lines = lines_from_infos(board, analysis.multipv)
+
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        return EngineResult(name=self.spec.name, mode=mode, elapsed_ms=elapsed_ms, lines=lines)
+
+    def abort(self) -> None:
+        with self._lock:
+            self._aborted = True
+            engine, analysis = self._engine, self._analysis
+        if analysis is not None:
+            analysis.stop()
+        elif engine is not None:
+            engine.close()
+
+
+def merge_results(results: list[EngineResult], k: int) -> list[EnsembleLine]:
+    """
+    Borda: ход на месте i у движка получает k - i очков. Сортировка по очкам,
+    затем по средней оценке.
+    """
+    points: dict[str, int] = {}
+    sans: dict[str, str] = {}
+    scores: dict[str, dict[str, int | None]] = {}
+
+    for res in results:
+        for rank, line in enumerate(res.lines[:k]):
+            points[line.move_uci] = points.get(line.move_uci, 0) + (k - rank)
+            sans[line.move_uci] = line.move_san
+            scores.setdefault(line.move_uci, {})[res.name] = line.score_cp
+
+    def mean_cp(uci: str) -> int | None:
+        vals = [cp for cp in scores[uci].values() if cp is not None]
+        return round(sum(vals) / len(vals)) if vals else None
+
+    def sort_key(uci: str) -> tuple[int, bool, int]:
+        cp = mean_cp(uci)
+        return (-points[uci], cp is None, -(cp or 0))
+
+    return [
+        EnsembleLine(
+            move_uci=uci,
+            move_san=sans[uci],
+            score_cp=mean_cp(uci),
+            engine_scores=scores[uci],
+            votes=len(scores[uci]),
+        )
+        for uci in sorted(points, key=sort_key)[:k]
+    ]
+
+
+def _agreement(results: list[EngineResult], best: str | None) -> tuple[float, float]:
+    tops = [res.lines[0].move_uci for res in results if res.lines]
+    top_agreement = tops.count(best) / len(tops) if tops and best else 0.0
+
+    sets = [{line.move_uci for line in res.lines} for res in results]
+    pairs = [(a, b) for i, a in enumerate(sets) for b in sets[i + 1:]]
+    if not pairs:
+        return top_agreement, 1.0
+    overlap = sum(len(a & b) / len(a | b) if a | b else 1.0 for a, b in pairs) / len(pairs)
+    return top_agreement, overlap
+
+
+def ensemble_suggest(
+    board: chess.Board,
+    specs: list[EngineSpec],
+    think_ms: int,
+    k: int = 3,
+    deadline_ms: int | None = None,
+) -> EnsemblePack:
+    """
+    Запускает все движки одновременно: время работы — как у самого медленного
+    участника, а не сумма. Через deadline_ms (от старта, включая запуск
+    процессов) берутся те движки, что успели; остальные убиваются.
+    """
+    names = [spec.name for spec in specs]
+    if not specs or len(set(names)) != len(names):
+        raise ValueError("Нужен хотя бы один движок, имена движков должны быть уникальны")
+
+    board = board.copy()
+    members = [_Member(spec) for spec in specs]
+    executor = ThreadPoolExecutor(max_workers=len(members), thread_name_prefix="ensemble")
+    try:
+        futures = {executor.submit(m.run, board, think_ms, k): m for m in members}
+        timeout = deadline_ms / 1000.0 if deadline_ms is not None else None
+        done, pending = wait(futures, timeout=timeout)
+        for fut in pending:
+            futures[fut].abort()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    results: list[EngineResult] = []
+    failed: dict[str, str] = {}
+    for fut, member in futures.items():
+        if fut not in done:
+            continue
+        try:
+            results.append(fut.result())
+        except Exception as e:
+            failed[member.spec.name] = str(e) or type(e).__name__
+    timed_out = [futures[fut].spec.name for fut in pending]
+
+    if not results:
+        raise RuntimeError(
+            f"Ни один движок не дал результата (не успели: {timed_out}, ошибки: {failed})"
+        )
+
+    results.sort(key=lambda r: names.index(r.name))
+    lines = merge_results(results, k)
+    top_agreement, overlap = _agreement(results, lines[0].move_uci if lines else None)
+    mode = "ensemble: " + ", ".join(f"{r.name}={r.mode}" for r in results)
+
+    return EnsemblePack(
+        mode=mode,
+        think_ms=think_ms,
+        lines=lines,
+        engines=results,
+        timed_out=timed_out,
+        failed=failed,
+        top_agreement=top_agreement,
+        overlap=overlap,
+    )
@@ -2,24 +2,24 @@ from __future__ import annotations
 
 import argparse
 import shutil
-from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
-import chess
-import chess.engine
+from suggestions import (
+    LineSuggestion,
+    SuggestionPack,
+    analyse_board,
+    configure_strength,
+    pack_from_dict,
+)
 
+# chess / chess.engine импортируем лениво внутри функций: клиентский режим
+# (--daemon) не должен платить за их загрузку при каждом запуске.
+if TYPE_CHECKING:
+    import chess
+    import chess.engine
 
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
 
-@dataclass(frozen=True)
-class LineSuggestion:
-    move_uci: str
-    move_san: str
-    score_cp: int | None
-
-@dataclass(frozen=True)
-class SuggestionPack:
-    mode: str
-    think_ms: int
-    lines: list[LineSuggestion]
 
 def find_stockfish(path: str | None) -> str:
     if path:
@@ -32,13 +32,6 @@ def find_stockfish(path: str | None) -> str:
             )
     return exe
 
-def score_to_cp(info_score: chess.engine.PovScore | None, turn: bool) -> int | None:
-    if info_score is None:
-        return None
-    s = info_score.pov(turn)
-    val = s.score(mate_score=100000)
-    return int(val) if val is not None else None
-
 def suggest_move(
         fen: str,
         engine_path: str | None = None,
@@ -46,7 +39,9 @@ def suggest_move(
         think_ms: int = 200,
         k: int = 3
         ) -> SuggestionPack:
-    
+    import chess
+    import chess.engine
+
     board = chess.Board(fen)
 
     if board.is_game_over():
@@ -56,81 +51,13 @@ def suggest_move(
 
     with chess.engine.SimpleEngine.popen_uci(path) as engine:
         mode = configure_strength(engine, elo)
-        limit = chess.engine.Limit(time=think_ms / 1000.0)
-
-
-        if k <= 1:
-            info = engine.analyse(board, limit)
-            infos = [info]
-        else:
-            infos = engine.analyse(board, limit, multipv=k)
-        
-        lines: list[LineSuggestion] = []
-
-        if k == 1:
-            info = engine.analyse(board, limit)
-            move = info["pv"][0]
-            lines.append(
-                LineSuggestion(
-                    move_uci=move.uci(),
-                    move_san=board.san(move),
-                    score_cp=score_to_cp(info.get("score"), board.turn),
-                )
-            )
-        else:
-            infos = engine.analyse(board, limit, multipv=k)
-            infos = sorted(infos, key=lambda d: d.get("multipv", 999))
-
-            for info in infos:
-                pv = info.get("pv")
-                if not pv:
-                    continue
-
-                move = pv[0]
-                lines.append(
-                    LineSuggestion(
-                        move_uci=move.uci(),
-                        move_san=board.san(move),
-                        score_cp=score_to_cp(info.get("score"), board.turn),   
-                    )
-                )
-        return SuggestionPack(mode=mode, think_ms=think_ms, lines=lines)
-
+        return analyse_board(engine, board, mode, think_ms, k)
 
 
-def configure_strength(engine: chess.engine.SimpleEngine, elo: int) -> str:
-
-    #tms = suggest_move(fen)
-    # включаем лимит силы, если опция есть
-    if "UCI_LimitStrength" in engine.options:
-        engine.configure({"UCI_LimitStrength": True})
-
-    # пробуем Elo, но учитываем min/max конкретной сборки
-    if "UCI_Elo" in engine.options:
-        opt = engine.options["UCI_Elo"]
-        min_elo = getattr(opt, "min", None)
-        max_elo = getattr(opt, "max", None)
-        applied = max(min_elo, min(max_elo, elo))
-
-        # if min_elo is not None:
-        #     applied = max(applied, int(min_elo))
-        # if max_elo is not None:
-        #     applied = min(applied, int(max_elo))
-
-        engine.configure({"UCI_Elo": applied})
-        return f"UCI_Elo={applied}"
-
-    # fallback: Skill Level
-    if "Skill Level" in engine.options:
-        # стартовое приближение под "слабый человек"
-        skill = 5
-        engine.configure({"Skill Level": skill})
-
-        return f"Skill Level={skill}"
-
-    return "default (no strength options)"
 
 def parse_user_move(board: chess.Board, s: str) -> chess.Move:
+    import chess
+
     s = s.strip()
     s = norm_san(s)
 
@@ -151,6 +78,9 @@ def parse_user_move(board: chess.Board, s: str) -> chess.Move:
     raise ValueError("Невалидный ход. Введи SAN (e4, Nf3) или UCI (e2e4, g1f3).")
 
 def play_console(engine_path: str | None, elo: int, think_ms: int) -> None:
+    import chess
+    import chess.engine
+
     board = chess.Board()
     path = find_stockfish(engine_path)
 
@@ -202,6 +132,16 @@ def norm_san(s: str) -> str:
     return s
 
 
+def print_pack(pack: SuggestionPack) -> None:
+    print(f"[engine] strength: {pack.mode}, think_ms={pack.think_ms}")
+    for i, line in enumerate(pack.lines, start=1):
+        print(f"{i}) SAN: {line.move_san:6} | UCI: {line.move_uci}", end="")
+        if line.score_cp is None:
+            print(" | Eval: mate/unknown")
+        else:
+            print(f" | Eval(cp): {line.score_cp:+d}")
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Подсказка хода Stockfish (~Elo) по FEN")
     ap.add_argument("--fen", help="FEN позиции в кавычках")
@@ -210,9 +150,22 @@ def main() -> None:
     ap.add_argument("--engine", default=None, help="Путь к stockfish (если не в PATH)")
     ap.add_argument("--topk", type=int, default=3, help="Сколько вариантов показать (MultiPV)")
     ap.add_argument("--play", action="store_true", help="Играть против движка в консоли")
-    ap.add_argument("--start-fen", default=chess.STARTING_FEN, help="Начальная позиция (FEN)")
+    ap.add_argument("--start-fen", default=STARTING_FEN, help="Начальная позиция (FEN)")
+    ap.add_argument("--daemon", action="store_true",
+                    help="Спросить резидентный демон (запустится сам, если не работает)")
+    ap.add_argument("--serve", action="store_true", help="Запустить демон подсказок")
+    ap.add_argument("--socket", default=None, help="Путь к Unix-сокету демона")
+    ap.add_argument("--idle-timeout", type=float, default=600.0,
+                    help="Демон завершается после N секунд простоя (0 — никогда)")
 
     args = ap.parse_args()
+    # === РЕЖИМ ДЕМОНА ===
+    if args.serve:
+        from hint_client import default_socket_path
+        from hint_daemon import serve
+
+        serve(args.socket or default_socket_path(), args.idle_timeout)
+        return
     # === РЕЖИМ ИГРЫ ===
     if args.play:
         play_console(
@@ -225,26 +178,29 @@ def main() -> None:
     if not args.fen:
         ap.error("--fen обязателен, если не используется --play")
 
+    if args.daemon:
+        from hint_client import request_hint
 
-    pack = suggest_move(
-        fen=args.fen,
-        engine_path=args.engine,
-        elo=args.elo,
-        think_ms=args.think_ms,
-        k=args.topk,
-    )
+        resp = request_hint(
+            fen=args.fen,
+            engine_path=args.engine,
+            elo=args.elo,
+            think_ms=args.think_ms,
+            k=args.topk,
+            socket_path=args.socket,
+            idle_timeout=args.idle_timeout,
+        )
+        pack = pack_from_dict(resp)
+    else:
+        pack = suggest_move(
+            fen=args.fen,
+            engine_path=args.engine,
+            elo=args.elo,
+            think_ms=args.think_ms,
+            k=args.topk,
+        )
 
-    print(f"[engine] strength: {pack.mode}, think_ms={pack.think_ms}")
-    for i, line in enumerate(pack.lines, start=1):
-        print(f"{i}) SAN: {line.move_san:6} | UCI: {line.move_uci}", end="")
-        if line.score_cp is None:
-            print(" | Eval: mate/unknown")
-        else:
-            print(f" | Eval(cp): {line.score_cp:+d}")
-    
-    if args.play:
-        play_console(args.engine, args.elo, args.think_ms)
-        return
+    print_pack(pack)
 
 
 
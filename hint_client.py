@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import time
+
+# Модуль нарочно зависит только от stdlib: это "тонкий" клиент для
+# `fen_hint.py --daemon`, его импорт должен стоить миллисекунды.
+
+START_TIMEOUT_S = 10.0
+POLL_S = 0.02
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, f"fen_hint-{os.getuid()}.sock")
+    # без XDG_RUNTIME_DIR (обычно macOS) не кладём сокет и лок прямо в общий
+    # /tmp: там чужой пользователь может заранее подложить симлинк или сокет
+    base = os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(_private_dir(os.path.join(base, f"fen_hint-{os.getuid()}")), "fen_hint.sock")
+
+
+def _private_dir(path: str) -> str:
+    """
+    Создаёт каталог 0700 или проверяет, что существующий принадлежит нам
+    и закрыт от остальных.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(
+            f"Каталог {path} не подходит для сокета демона: это должен быть "
+            "наш каталог с правами 0700"
+        )
+    return path
+
+
+def _connect(socket_path: str) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def spawn_daemon(socket_path: str, idle_timeout: float) -> None:
+    """
+    Запускает `fen_hint.py --serve` в фоне, отвязанным от терминала.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fen_hint.py")
+    subprocess.Popen(
+        [
+            sys.executable, script, "--serve",
+            "--socket", socket_path,
+            "--idle-timeout", str(idle_timeout),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def connect_or_spawn(socket_path: str, idle_timeout: float) -> socket.socket:
+    sock = _connect(socket_path)
+    if sock is not None:
+        return sock
+
+    spawn_daemon(socket_path, idle_timeout)
+    deadline = time.monotonic() + START_TIMEOUT_S
+    while time.monotonic() < deadline:
+        time.sleep(POLL_S)
+        sock = _connect(socket_path)
+        if sock is not None:
+            return sock
+    raise RuntimeError(f"Демон подсказок не поднялся за {START_TIMEOUT_S:.0f} с: {socket_path}")
+
+
+def request_hint(
+        fen: str,
+        engine_path: str | None = None,
+        elo: int = 1000,
+        think_ms: int = 200,
+        k: int = 3,
+        socket_path: str | None = None,
+        idle_timeout: float = 600.0,
+        ) -> dict:
+    """
+    Отправляет запрос демону и возвращает ответ как dict
+    (поля SuggestionPack). Ошибку демона поднимает как RuntimeError.
+    """
+    socket_path = socket_path or default_socket_path()
+    # демон мог быть запущен из другого каталога
+    if engine_path and os.sep in engine_path:
+        engine_path = os.path.abspath(engine_path)
+    req = {"fen": fen, "engine": engine_path, "elo": elo, "think_ms": think_ms, "k": k}
+
+    with connect_or_spawn(socket_path, idle_timeout) as sock:
+        # запас на холодный старт движка внутри демона
+        sock.settimeout(think_ms / 1000.0 + 30.0)
+        sock.sendall(json.dumps(req).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            raw = f.readline()
+
+    if not raw:
+        raise RuntimeError("Демон подсказок закрыл соединение без ответа")
+    resp = json.loads(raw)
+    if "error" in resp:
+        raise RuntimeError(resp["error"])
+    return resp
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import asdict
+
+from chess_core import find_stockfish
+from engine_pool import WarmAnalyzer
+from suggestions import SuggestionPack
+
+# Резидентный демон для `fen_hint.py --daemon`: держит "тёплые" движки и кэш
+# анализа (engine_pool.WarmAnalyzer), общается с клиентом (hint_client) по
+# Unix-сокету, одна строка JSON на запрос и одна на ответ.
+
+
+class HintServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str) -> None:
+        self.analyzer = WarmAnalyzer()
+        self.last_activity = time.monotonic()
+        super().__init__(socket_path, _HintHandler)
+
+    def hint(self, req: dict) -> SuggestionPack:
+        return self.analyzer.suggest(
+            fen=req["fen"],
+            path=find_stockfish(req.get("engine")),
+            elo=int(req.get("elo", 1000)),
+            think_ms=int(req.get("think_ms", 200)),
+            k=int(req.get("k", 3)),
+        )
+
+
+class _HintHandler(socketserver.StreamRequestHandler):
+    server: HintServer
+
+    def handle(self) -> None:
+        self.server.last_activity = time.monotonic()
+        raw = self.rfile.readline()
+        if not raw:
+            return
+        try:
+            pack = self.server.hint(json.loads(raw))
+            resp = asdict(pack)
+        except Exception as e:
+            resp = {"error": str(e)}
+        self.wfile.write(json.dumps(resp).encode("utf-8") + b"\n")
+        self.server.last_activity = time.monotonic()
+
+
+def _socket_alive(socket_path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def serve(socket_path: str, idle_timeout: float = 600.0) -> None:
+    """
+    Обслуживает запросы, пока не пройдёт idle_timeout секунд без них
+    (0 — без ограничения).
+    """
+    # проверка/unlink/bind под эксклюзивным локом: иначе два одновременно
+    # стартующих демона могут удалить сокет друг друга
+    # O_NOFOLLOW: подложенный вместо лока симлинк не даст перезаписать чужой файл
+    lock_fd = os.open(socket_path + ".lock", os.O_CREAT | os.O_WRONLY | os.O_NOFOLLOW, 0o600)
+    with os.fdopen(lock_fd, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.exists(socket_path):
+            if _socket_alive(socket_path):
+                return  # демон уже работает (например, гонка двух клиентов)
+            os.unlink(socket_path)
+
+        server = HintServer(socket_path)
+        os.chmod(socket_path, 0o600)
+
+    def watch_idle() -> None:
+        while True:
+            time.sleep(1.0)
+            if time.monotonic() - server.last_activity > idle_timeout:
+                server.shutdown()
+                return
+
+    if idle_timeout > 0:
+        threading.Thread(target=watch_idle, daemon=True).start()
+    # shutdown() ждёт serve_forever, поэтому из обработчика — в отдельном потоке
+    signal.signal(
+        signal.SIGTERM,
+        lambda *_: threading.Thread(target=server.shutdown, daemon=True).start(),
+    )
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.analyzer.close()
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+# Общие типы и разбор вывода движка для chess_core, fen_hint и модулей поверх
+# них. chess импортируется лениво: fen_hint --daemon не должен его грузить.
+if TYPE_CHECKING:
+    import chess
+    import chess.engine
+
+
+@dataclass(frozen=True)
+class LineSuggestion:
+    move_uci: str
+    move_san: str
+    score_cp: int | None
+
+@dataclass(frozen=True)
+class SuggestionPack:
+    mode: str
+    think_ms: int
+    lines: list[LineSuggestion]
+
+def pack_from_dict(d: dict) -> SuggestionPack:
+    """
+    Обратное к dataclasses.asdict: SuggestionPack, пришедший по сети в JSON.
+    """
+    return SuggestionPack(
+        mode=d["mode"],
+        think_ms=d["think_ms"],
+        lines=[LineSuggestion(**line) for line in d["lines"]],
+    )
+
+def score_to_cp(info_score: chess.engine.PovScore | None, turn: bool) -> int | None:
+    if info_score is None:
+        return None
+    s = info_score.pov(turn)
+    val = s.score(mate_score=100000)
+    return int(val) if val is not None else None
+
+def lines_from_infos(board: chess.Board, infos: list[chess.engine.InfoDict]) -> list[LineSuggestion]:
+    """
+    MultiPV-вывод движка -> LineSuggestion по порядку multipv.
+    """
+    infos = sorted(infos, key=lambda d: d.get("multipv", 1))
+
+    lines: list[LineSuggestion] = []
+    for info in infos:
+        pv = info.get("pv")
+        if not pv:
+            continue
+
+        move = pv[0]
+        lines.append(
+            LineSuggestion(
+                move_uci=move.uci(),
+                move_san=board.san(move),
+                score_cp=score_to_cp(info.get("score"), board.turn),
+            )
+        )
+    return lines
+
+def analyse_board(
+        engine: chess.engine.SimpleEngine,
+        board: chess.Board,
+        mode: str,
+        think_ms: int,
+        k: int = 3,
+        ) -> SuggestionPack:
+    """
+    Топ-k вариантов на уже запущенном движке.
+    """
+    import chess.engine
+
+    limit = chess.engine.Limit(time=think_ms / 1000.0)
+
+    infos = engine.analyse(board, limit, multipv=k) if k > 1 else [engine.analyse(board, limit)]
+    return SuggestionPack(mode=mode, think_ms=think_ms, lines=lines_from_infos(board, infos))
+
+def configure_strength(engine: chess.engine.SimpleEngine, elo: int | None) -> str:
+    # elo=None — полная сила: снимаем ограничения, если движок уже был ослаблен
+    if elo is None:
+        if "UCI_LimitStrength" in engine.options:
+            engine.configure({"UCI_LimitStrength": False})
+        if "Skill Level" in engine.options:
+            opt = engine.options["Skill Level"]
+            skill = opt.max if opt.max is not None else opt.default
+            if skill is not None:
+                engine.configure({"Skill Level": skill})
+        return "full strength"
+
+    # включаем лимит силы, если опция есть
+    if "UCI_LimitStrength" in engine.options:
+        engine.configure({"UCI_LimitStrength": True})
+
+    # пробуем Elo, но учитываем min/max конкретной сборки
+    if "UCI_Elo" in engine.options:
+        opt = engine.options["UCI_Elo"]
+        min_elo = getattr(opt, "min", None)
+        max_elo = getattr(opt, "max", None)
+
+        # у некоторых сборок min/max не заданы — клампим только по известным
+        applied = elo
+        if min_elo is not None:
+            applied = max(applied, int(min_elo))
+        if max_elo is not None:
+            applied = min(applied, int(max_elo))
+
+        engine.configure({"UCI_Elo": applied})
+        return f"UCI_Elo={applied}"
+
+    # fallback: Skill Level
+    if "Skill Level" in engine.options:
+        # стартовое приближение под "слабый человек"
+        skill = 5
+        engine.configure({"Skill Level": skill})
+
+        return f"Skill Level={skill}"
+
+    return "default (no strength options)"
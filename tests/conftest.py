@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+@pytest.fixture
+def stub_engine(tmp_path):
+    # popen_uci нужен один исполняемый путь, поэтому обёртка над stub_uci.py
+    path = tmp_path / "stub_engine"
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(HERE, "stub_uci.py")}" "$@"\n')
+    path.chmod(0o755)
+    return str(path)
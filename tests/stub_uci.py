@@ -0,0 +1,95 @@
+"""
+Минимальный UCI-движок для тестов: ходы по алфавиту UCI, фиктивные оценки.
+
+Переменные окружения:
+  STUB_UCI_LOG        — файл, куда на каждый go дописывается FEN позиции;
+  STUB_UCI_CRASH_FEN  — расстановка (board_fen), на которой go роняет процесс;
+  STUB_UCI_PIDS       — файл, куда при старте дописывается PID процесса.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import sys
+import threading
+
+import chess
+
+
+def main() -> None:
+    pids = os.environ.get("STUB_UCI_PIDS")
+    if pids:
+        with open(pids, "a", encoding="utf-8") as f:
+            f.write(f"{os.getpid()}\n")
+
+    lines: queue.Queue[str | None] = queue.Queue()
+
+    def read_stdin() -> None:
+        for raw in sys.stdin:
+            lines.put(raw)
+        lines.put(None)
+
+    threading.Thread(target=read_stdin, daemon=True).start()
+
+    def out(s: str) -> None:
+        sys.stdout.write(s + "\n")
+        sys.stdout.flush()
+
+    board = chess.Board()
+    multipv = 1
+    pending: list[str] = []
+
+    while True:
+        raw = pending.pop(0) if pending else lines.get()
+        if raw is None:
+            return
+        parts = raw.split()
+        if not parts:
+            continue
+        cmd = parts[0]
+
+        if cmd == "uci":
+            out("id name Stub")
+            out("option name UCI_LimitStrength type check default false")
+            out("option name UCI_Elo type spin default 1350 min 1320 max 3190")
+            out("option name MultiPV type spin default 1 min 1 max 500")
+            out("uciok")
+        elif cmd == "isready":
+            out("readyok")
+        elif cmd == "setoption" and "MultiPV" in parts:
+            multipv = int(parts[-1])
+        elif cmd == "position":
+            if parts[1] == "startpos":
+                board, rest = chess.Board(), parts[2:]
+            else:
+                board, rest = chess.Board(" ".join(parts[2:8])), parts[8:]
+            if rest and rest[0] == "moves":
+                for m in rest[1:]:
+                    board.push_uci(m)
+        elif cmd == "go":
+            if os.environ.get("STUB_UCI_CRASH_FEN") == board.board_fen():
+                sys.exit(3)
+            log = os.environ.get("STUB_UCI_LOG")
+            if log:
+                with open(log, "a", encoding="utf-8") as f:
+                    f.write(board.fen() + "\n")
+
+            ms = int(parts[parts.index("movetime") + 1]) if "movetime" in parts else 100
+            # "думаем" movetime, но на stop отвечаем сразу
+            try:
+                nxt = lines.get(timeout=ms / 1000.0)
+                if nxt is not None and nxt.split()[:1] != ["stop"]:
+                    pending.append(nxt)
+            except queue.Empty:
+                pass
+
+            moves = sorted(board.legal_moves, key=lambda m: m.uci())
+            for i, m in enumerate(moves[:multipv], start=1):
+                out(f"info depth 1 multipv {i} score cp {50 - 10 * i} pv {m.uci()}")
+            out(f"bestmove {moves[0].uci() if moves else '0000'}")
+        elif cmd == "quit":
+            return
+
+
+if __name__ == "__main__":
+    main()
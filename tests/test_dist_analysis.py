@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from dist_analysis import Coordinator
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DIST = os.path.join(os.path.dirname(HERE), "dist_analysis.py")
+
+QUEEN_ENDGAME = "8/8/8/4k3/8/8/3QK3/8 w - - 0 1"
+
+
+@pytest.fixture
+def coordinator():
+    coord = Coordinator(port=0, lease_s=1.0, max_attempts=3)
+    coord.start()
+    yield coord
+    coord.close()
+
+
+@pytest.fixture
+def spawn_worker(coordinator, stub_engine, tmp_path):
+    procs: list[subprocess.Popen] = []
+
+    def spawn(**env: str) -> subprocess.Popen:
+        proc = subprocess.Popen(
+            [sys.executable, DIST, "worker", "--port", str(coordinator.address[1]), "--engine", stub_engine],
+            env={**os.environ, "STUB_UCI_LOG": str(tmp_path / "go.log"), **env},
+        )
+        procs.append(proc)
+        return proc
+
+    yield spawn
+    for proc in procs:
+        proc.kill()
+        proc.wait()
+
+
+def go_log(tmp_path) -> list[str]:
+    path = tmp_path / "go.log"
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def wait_until(cond, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_positions_differing_only_in_counters_run_once(coordinator, spawn_worker, tmp_path):
+    spawn_worker()
+    spawn_worker()
+    fens = [
+        QUEEN_ENDGAME,
+        "8/8/8/4k3/8/8/3RK3/8 w - - 0 1",
+        "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1",
+    ]
+    same_position = [f.rsplit(" ", 2)[0] + " 7 42" for f in fens]
+
+    futures = [coordinator.submit(f, 100, 2) for f in fens + same_position]
+    assert all(a is b for a, b in zip(futures[:3], futures[3:]))
+
+    packs = [f.result(timeout=30) for f in futures]
+    assert packs[:3] == packs[3:]
+    assert len(go_log(tmp_path)) == 3
+
+    # готовый результат отдаётся без новой задачи
+    assert coordinator.submit(same_position[0], 100, 2).done()
+    assert len(go_log(tmp_path)) == 3
+
+
+def test_strength_is_set_per_job(coordinator, spawn_worker, tmp_path):
+    spawn_worker()
+    full = coordinator.submit(QUEEN_ENDGAME, 50, 1)
+    weak = coordinator.submit(QUEEN_ENDGAME, 50, 1, elo=1500)
+    assert full is not weak
+
+    assert full.result(timeout=30).mode == "full strength"
+    assert weak.result(timeout=30).mode == "UCI_Elo=1500"
+    assert len(go_log(tmp_path)) == 2
+
+
+def test_killed_worker_job_is_finished_by_another(coordinator, spawn_worker, tmp_path):
+    first = spawn_worker()
+    fut = coordinator.submit(QUEEN_ENDGAME, 1500, 1)
+    wait_until(lambda: len(go_log(tmp_path)) == 1)
+
+    spawn_worker()
+    wait_until(lambda: len(coordinator.workers()) == 2)
+    first.send_signal(signal.SIGKILL)
+
+    pack = fut.result(timeout=30)
+    assert pack.lines[0].move_uci == "d2a2"
+    assert len(go_log(tmp_path)) == 2
+    assert len(coordinator.workers()) == 1
+
+
+def test_job_gives_up_after_max_attempts(coordinator, spawn_worker):
+    worker = spawn_worker(STUB_UCI_CRASH_FEN="8/8/8/4k3/8/8/3QK3/8")
+
+    poisoned = coordinator.submit(QUEEN_ENDGAME, 50, 1)
+    with pytest.raises(RuntimeError, match="попыток: 3"):
+        poisoned.result(timeout=30)
+
+    # движок перезапускается, воркер продолжает работать
+    assert worker.poll() is None
+    healthy = coordinator.submit("8/8/8/4k3/8/8/3RK3/8 w - - 0 1", 50, 1)
+    assert healthy.result(timeout=30).lines
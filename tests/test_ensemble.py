@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+import time
+
+import chess
+
+from ensemble import EngineResult, EngineSpec, _agreement, ensemble_suggest, merge_results
+from suggestions import LineSuggestion
+
+
+def result(name: str, *lines: tuple[str, int | None]) -> EngineResult:
+    board = chess.Board()
+    return EngineResult(
+        name=name,
+        mode="test",
+        elapsed_ms=0,
+        lines=[
+            LineSuggestion(move_uci=uci, move_san=board.san(chess.Move.from_uci(uci)), score_cp=cp)
+            for uci, cp in lines
+        ],
+    )
+
+
+def alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_merge_results_borda_points():
+    lines = merge_results(
+        [
+            result("a", ("e2e4", 30), ("d2d4", 25), ("g1f3", 20)),
+            result("b", ("d2d4", 40), ("e2e4", 35), ("c2c4", 10)),
+            result("c", ("e2e4", 20), ("c2c4", 15), ("d2d4", None)),
+        ],
+        k=3,
+    )
+
+    # e2e4: 3+2+3, d2d4: 2+3+1, c2c4: 1+2, g1f3: 1
+    assert [line.move_uci for line in lines] == ["e2e4", "d2d4", "c2c4"]
+    assert lines[0].votes == 3
+    assert lines[0].engine_scores == {"a": 30, "b": 35, "c": 20}
+    assert lines[0].score_cp == 28
+    # None в средней оценке не участвует
+    assert lines[1].score_cp == round((25 + 40) / 2)
+
+
+def test_merge_results_ties_broken_by_mean_score():
+    lines = merge_results(
+        [
+            result("a", ("e2e4", 10), ("d2d4", 50)),
+            result("b", ("d2d4", 50), ("e2e4", 10)),
+            result("c", ("g1f3", None)),
+        ],
+        k=2,
+    )
+
+    assert [line.move_uci for line in lines] == ["d2d4", "e2e4"]
+
+
+def test_merge_results_ignores_lines_past_k():
+    lines = merge_results([result("a", ("e2e4", 10), ("d2d4", 5), ("g1f3", 0))], k=2)
+    assert [line.move_uci for line in lines] == ["e2e4", "d2d4"]
+
+
+def test_agreement():
+    results = [
+        result("a", ("e2e4", 0), ("d2d4", 0)),
+        result("b", ("e2e4", 0), ("c2c4", 0)),
+        result("c", ("d2d4", 0), ("e2e4", 0)),
+    ]
+    top_agreement, overlap = _agreement(results, "e2e4")
+
+    assert top_agreement == 2 / 3
+    assert overlap == (1 / 3 + 1 + 1 / 3) / 3
+    assert _agreement(results[:1], "e2e4") == (1.0, 1.0)
+
+
+def test_slow_member_times_out_and_is_killed(stub_engine, tmp_path, monkeypatch):
+    pids = tmp_path / "pids"
+    monkeypatch.setenv("STUB_UCI_PIDS", str(pids))
+    specs = [
+        EngineSpec("fast", stub_engine),
+        EngineSpec("weak", stub_engine, elo=1500),
+        EngineSpec("slow", stub_engine, think_ms=30_000),
+    ]
+
+    start = time.monotonic()
+    pack = ensemble_suggest(chess.Board(), specs, think_ms=100, k=2, deadline_ms=3000)
+    assert time.monotonic() - start < 10
+
+    assert pack.timed_out == ["slow"]
+    assert pack.failed == {}
+    assert [res.name for res in pack.engines] == ["fast", "weak"]
+    assert pack.mode == "ensemble: fast=full strength, weak=UCI_Elo=1500"
+    assert [line.votes for line in pack.lines] == [2, 2]
+
+    started = [int(pid) for pid in pids.read_text().split()]
+    assert len(started) == 3
+    deadline = time.monotonic() + 10
+    while any(alive(pid) for pid in started):
+        assert time.monotonic() < deadline, "движки остались запущены"
+        time.sleep(0.05)
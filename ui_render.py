@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+import chess
+import chess.svg
+
+# Слой рендера для ui_streamlit: Streamlit перезапускает весь скрипт на каждый
+# клик, а SVG доски зависит только от позиции и параметров отрисовки.
+
+RENDER_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def board_svg(fen: str, last_move_uci: str | None, orientation: bool, size: int) -> str:
+    board = chess.Board(fen)
+    lastmove = chess.Move.from_uci(last_move_uci) if last_move_uci else None
+    return chess.svg.board(board=board, size=size, lastmove=lastmove, orientation=orientation)
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def board_text(fen: str) -> str:
+    return str(chess.Board(fen))
@@ -1,11 +1,9 @@
 import streamlit as st
 import chess
-import chess.engine
-import chess.svg
 import streamlit.components.v1 as components
-import shutil
-from chess_core import start_engine, stop_engine, parse_user_move, suggest_topk, engine_reply_move
-from fen_hint import find_stockfish, configure_strength
+from chess_core import parse_user_move
+from ui_render import board_svg, board_text
+from ui_tasks import EngineTasks
 
 st.set_page_config(page_title="Chess Helper", layout="centered")
 st.title("♟️ Chess Helper (подсказчик + игра)")
@@ -14,12 +12,9 @@ st.title("♟️ Chess Helper (подсказчик + игра)")
 # Session state INIT
 # =========================
 
-if "engine" not in st.session_state:
-    st.session_state.engine = None
-
 if "engine_mode" not in st.session_state:
     st.session_state.engine_mode = ""
-    
+
 if "board" not in st.session_state:
     st.session_state.board = chess.Board()
 
@@ -31,79 +26,100 @@ if "log" not in st.session_state:
 
 if "suggestions" not in st.session_state or not isinstance(st.session_state.suggestions, list):
     st.session_state.suggestions = []
-# =========================
-
-def require_engine(engine_path: str | None, elo: int):
-
-    if st.session_state.engine is None:
-        eng, mode = start_engine(engine_path, elo)
-        st.session_state.engine = eng
-        st.session_state.engine_mode = mode
-    return st.session_state.engine, st.session_state.engine_mode
-
-def compute_suggestions(board: chess.Board, engine_path: str | None, elo: int, think_ms: int, topik:int) -> None:
-    engine, mode = require_engine(engine_path, elo)
-    limit = chess.engine.Limit(time=think_ms / 1000.0)
-
-    infos = engine.analyse(board, limit, multipv=topk) if topk > 1 else [engine.analyse(board, limit)]
-    infos = sorted(infos, key=lambda d: d.get("multipv", 1))
-
-    sugg: list[tuple[str, str, int | None]] = []
-
-    for info in infos:
-        pv = info.get("pv")
-        if not pv:
-            continue
-        m = pv[0]
-        uci = m.uci()
-        san = board.san(m)
-
-        score = info.get("score")
-        cp = None
-        if score is not None:
-            val = score.pov(board.turn).score(mate_score=10000)
-            cp = int(val) if val is not None else None
-        
-        sugg.append((uci, san, cp))
-
-    st.session_state.suggestions = []
-    st.session_state.suggestions = sugg
-    st.session_state.suggestions = mode
-# --------- Состояние доски
-
-board: chess.Board = st.session_state.board
 
+# ключ (fen, engine_path, elo, think_ms, topk), для которого посчитаны suggestions
+if "suggestions_key" not in st.session_state:
+    st.session_state.suggestions_key = None
 
-# --------- Отображение
-st.subheader("Позиция")
-st.code(board.fen())
-st.text(str(board))
-
-last = st.session_state.get("last_move")
-svg_bytes = chess.svg.board(board=board, size=420, lastmove=last,)
-components.html(svg_bytes, height=460, width=460)
-with st.expander("Показать текстовую доску"):
-    st.text(str(board))
-
+# ключ, на котором анализ упал: автоматически его не повторяем, пока не
+# изменится позиция/настройки или не нажата "Подсказки"
+if "suggestions_error_key" not in st.session_state:
+    st.session_state.suggestions_error_key = None
+    st.session_state.suggestions_error = ""
 
+# фоновые задачи движка: (ключ/fen, Future) или None
+if "suggest_job" not in st.session_state:
+    st.session_state.suggest_job = None
 
-def get_engine(engine_path: str | None, elo: int):
-    if "engine" not in st.session_state:
-        eng, mode = start_engine(engine_path, elo)
-        st.session_state.engine = eng
-        st.session_state.engine_mode = mode
-    return st.session_state.engine, st.session_state.engine_mode
+if "reply_job" not in st.session_state:
+    st.session_state.reply_job = None
+# =========================
 
 @st.cache_resource
-def get_engine_cache(engine_path: str | None, elo: int) -> tuple[chess.engine.SimpleEngine, str]:
-    path = engine_path or shutil.which("stockfish")
-    if not path:
-        raise RuntimeError("Stockfish не найден. Установи: brew install stockfish")
-    
-    eng = chess.engine.SimpleEngine.popen_uci(path)
-
-    mode = configure_strength(eng, elo)
-    return eng, mode
+def get_tasks() -> EngineTasks:
+    return EngineTasks()
+
+def request_suggestions(key: tuple, retry: bool = False) -> None:
+    """
+    Ставит анализ в фон, если для key ещё нет ни результата, ни задачи.
+    Упавший key повторяется только при retry=True.
+    """
+    if st.session_state.suggestions_key == key:
+        return
+    if st.session_state.suggestions_error_key == key and not retry:
+        return
+    job = st.session_state.suggest_job
+    if job is not None and job[0] == key:
+        return
+    st.session_state.suggestions_error_key = None
+    fen, engine_path, elo, think_ms, topk = key
+    try:
+        st.session_state.suggest_job = (key, get_tasks().suggest(fen, engine_path, elo, think_ms, topk))
+    except Exception as e:
+        st.session_state.suggestions_error_key = key
+        st.session_state.suggestions_error = str(e)
+
+def request_reply(board: chess.Board, engine_path: str | None, elo: int, think_ms: int) -> None:
+    if st.session_state.reply_job is not None or board.is_game_over():
+        return
+    fen = board.fen()
+    st.session_state.reply_job = (fen, get_tasks().reply(fen, engine_path, elo, think_ms))
+
+def collect_tasks(board: chess.Board) -> None:
+    """
+    Забирает готовые результаты фоновых задач. Результат для позиции,
+    которая успела измениться, выбрасывается.
+    """
+    job = st.session_state.suggest_job
+    if job is not None and job[1].done():
+        key, fut = job
+        st.session_state.suggest_job = None
+        try:
+            pack = fut.result()
+        except Exception as e:
+            st.session_state.suggestions_error_key = key
+            st.session_state.suggestions_error = str(e)
+        else:
+            if key[0] == board.fen():
+                st.session_state.suggestions = [
+                    (line.move_uci, line.move_san, line.score_cp) for line in pack.lines
+                ]
+                st.session_state.suggestions_key = key
+                st.session_state.engine_mode = pack.mode
+
+    job = st.session_state.reply_job
+    if job is not None and job[1].done():
+        fen, fut = job
+        st.session_state.reply_job = None
+        try:
+            mode, m, san = fut.result()
+        except Exception as e:
+            st.error(str(e))
+        else:
+            if fen == board.fen():
+                board.push(m)
+                st.session_state.last_move = m
+                st.session_state.engine_mode = mode
+                st.session_state.log.append(f"🤖 {san} ({m.uci()}) [{mode}]")
+
+@st.fragment(run_every=0.25)
+def watch_tasks() -> None:
+    jobs = [j for j in (st.session_state.suggest_job, st.session_state.reply_job) if j is not None]
+    if not jobs:
+        return
+    if any(fut.done() for _, fut in jobs):
+        st.rerun()
+    st.caption("⏳ Движок думает…")
 
 
 # --------- Настройки справа
@@ -115,108 +131,74 @@ with st.sidebar:
     topk = st.slider("Подсказок", 1, 5, 3, key="topk")
     trainer_mode = st.checkbox("Режим тренера (показывать подсказки перед ходом)", value=True)
     auto_reply = st.checkbox("Авто-ответ движка после моего хода",value=False)
+    flipped = st.checkbox("Чёрные снизу", value=False)
 
-    st.sidebar.write("suggestions type:", type(st.session_state.suggestions))
+    fen_text = st.text_input("FEN позиции", value="", key="fen_text")
+    if st.button("Загрузить FEN"):
+        try:
+            st.session_state.board = chess.Board(fen_text)
+            st.session_state.last_move = None
+            st.session_state.reply_job = None
+            st.rerun()
+        except ValueError:
+            st.error("Неверный FEN")
 engine_path = engine_path.strip() or None
 
 
+# --------- Состояние доски
+
+board: chess.Board = st.session_state.board
+collect_tasks(board)
+fen = board.fen()
+sugg_key = (fen, engine_path, elo, think_ms, topk)
+
 
-sig = (engine_path, elo)
+# --------- Отображение
+st.subheader("Позиция")
+st.code(fen)
 
-if "engine_sig" not in st.session_state:
-    st.session_state.engine_sig = sig
-elif st.session_state.engine_sig != sig:
-    get_engine_cache.clear()
-    st.session_state.engine_sig = sig
+last = st.session_state.get("last_move")
+svg = board_svg(fen, last.uci() if last else None, not flipped, 420)
+components.html(svg, height=460, width=460)
+with st.expander("Показать текстовую доску"):
+    st.text(board_text(fen))
 
 
 col1, col2, col3 = st.columns(3)
 with col1:
     if st.button("Сброс"):
-        stop_engine(st.session_state.engine)
-        st.session_state.engine = None
-        st.session_state.engine_mode = ""
         st.session_state.board = chess.Board()
         st.session_state.log = []
         st.session_state.last_move = None
+        st.session_state.suggestions = []
+        st.session_state.suggestions_key = None
+        st.session_state.suggestions_error_key = None
+        st.session_state.suggest_job = None
+        st.session_state.reply_job = None
         st.rerun()
     if st.button("Undo"):
-        board.pop()
-        st.session_state.last_move = board.peek() if board.move_stack else None
-        st.session_state.log.append("↩️ Undo")
+        if board.move_stack:
+            board.pop()
+            st.session_state.last_move = board.peek() if board.move_stack else None
+            st.session_state.log.append("↩️ Undo")
         st.rerun()
 
 with col2:
     if st.button("Подсказки"):
-        try:
-            engine, mode = get_engine(engine_path, elo)
-            limit = chess.engine.Limit(time=think_ms / 1000.0)
-
-            infos = engine.analyse(board, limit, multipv=topk) if topk > 1 else [engine.analyse(board, limit)]
-            infos = sorted(infos, key=lambda d: d.get("multipv", 1))
-
-            st.session_state.suggestions = []
-            for info in infos:
-                pv = info.get("pv")
-                if not pv:
-                    continue
-                m = pv[0]
-                san = board.san(m)
-                st.session_state.suggestions.append((m.uci(), board.san(m), cp))
-
-            if st.session_state.suggestions:
-                st.subheader("Подсказки (кликни чтобы сделать ход)")
-                for uci in st.session_state.suggestions:
-                    m = chess.Move.from_uci(uci)
-                    label = board.san(m) if m in board.legal_moves else uci
-                    if st.button(f"➡️ {label} ({uci})", key=f"sug_{uci}"):
-                        # применяем ход
-                        san = board.san(m)
-                        board.push(m)
-                        st.session_state.last_move = m
-                        st.session_state.log.append(f"💡 Подсказка: {san} ({uci})")
-                        st.rerun()
-
-
-            st.info(f"[engine] {mode}, think_ms={think_ms}")
-            for i, info in enumerate(infos, start=1):
-                pv = info.get("pv")
-                if not pv:
-                    continue
-                m = pv[0]
-                san = board.san(m)
-                score = info.get("score")
-                cp = None
-                if score is not None:
-                    val = score.pov(board.turn).score(mate_score=100000)
-                    cp = int(val) if val is not None else None
-                eval_txt = "mate/unknown" if cp is None else f"{cp:+d} cp"
-                st.write(f"{i}) **{san}** ({m.uci()}) — {eval_txt}")
-        except Exception as e:
-            st.error(str(e))
+        request_suggestions(sugg_key, retry=True)
 
 with col3:
     if st.button("Ход движка"):
         try:
-            engine, mode = get_engine(engine_path, elo)
-            engine, mode = get_engine_cache(engine_path, elo)
-            engine, mode = require_engine(engine_path, elo)
-            limit = chess.engine.Limit(time=think_ms / 1000.0)
-            result = engine.play(board, limit)
-            m = result.move
-            san = board.san(m)
-            board.push(m)
-            st.session_state.last_move = m
-            st.session_state.log.append(f"🤖 {san} ({m.uci()}) [{mode}]")
-            st.rerun()
+            request_reply(board, engine_path, elo, think_ms)
         except Exception as e:
             st.error(str(e))
 
-if trainer_mode and not board.is_game_over():
-    try:
-        compute_suggestions(board, engine_path, elo, think_ms, topk)
-    except Exception as e:
-        st.warning(f"Не смог получить подсказки: {e}")
+if trainer_mode and not board.is_game_over() and st.session_state.reply_job is None:
+    request_suggestions(sugg_key)
+
+if st.session_state.suggestions_error_key == sugg_key:
+    st.warning(f"Не смог получить подсказки: {st.session_state.suggestions_error}")
 
 st.subheader("Сделать ход")
 move_text = st.text_input("Ваш ход (SAN или UCI)", value="", placeholder="например: e4 или g1f3")
@@ -226,24 +208,10 @@ if st.button("Применить ход"):
         m = parse_user_move(board, move_text)
         san = board.san(m)
         board.push(m)
-        engine, mode = require_engine(engine_path, elo)
-        limit = chess.engine.Limit(time=think_ms / 1000.0)
-        em = res.move
-        es = board.san(em)
-        board.push(em)
-        if auto_reply and not board.is_game_over():
-            engine, mode = require_engine(engine_path, elo)
-            limit = chess.engine.Limit(time=think_ms / 1000.0)
-            res = engine.play(board, limit)
-            em = res.move
-            es = board.san(em)
-            board.push(es)
-            st.session_state.last_move = em
-            st.session_state.log.append(f"🙂 {es} ({em.uci()}) [{mode}]")
-        st.session_state.last_move = em
         st.session_state.last_move = m
-        st.session_state.log.append(f"🙂 {es} ({em.uci()}) [{mode}]")
         st.session_state.log.append(f"🙂 {san} ({m.uci()})")
+        if auto_reply:
+            request_reply(board, engine_path, elo, think_ms)
         st.rerun()
     except Exception as e:
         st.error(str(e))
@@ -251,64 +219,36 @@ if st.button("Применить ход"):
 if st.button("Отменить ход"):
     if board.move_stack:
         board.pop()
+        st.session_state.last_move = board.peek() if board.move_stack else None
         st.rerun()
 
-try:
-    st.session_state.board = chess.Board(move_text) #???? fen_text - not found, fen_text or move_text???
-except ValueError:
-    st.error("Неверный FEN")
+watch_tasks()
 
 st.subheader("Лог ходов")
-for line in st.session_state.log[-20:]:
-    st.write(line)
+if st.session_state.log:
+    st.text("\n".join(st.session_state.log[-20:]))
 
 if board.is_game_over():
     st.success(f"Игра окончена: {board.result()}")
 
-st.sidebar.write("engine is None?", st.session_state.engine is None)
 
-
-if trainer_mode and len(st.session_state.suggestions) > 0:
+if st.session_state.suggestions_key == sugg_key and st.session_state.suggestions:
     st.subheader("Подсказки")
     st.caption(f"[engine] {st.session_state.engine_mode}, think_ms={think_ms}")
 
-    sug = st.session_state.get("suggestions", [])
-    if isinstance(sug, str):
-        st.session_state.suggestions = []
-        sug = []
-    if not isinstance(sug, list):
-        st.session_state = []
-        sug = []
-
-    for item in sug:
-        if isinstance(item, tuple) and len(item) == 3:
-            uci, san, cp = item
-        else:
-            uci = str(item)
-            m = chess.Move.from_uci(uci)
-            san = board.san(m) if m in board.legal_moves else uci
-            cp = None
+    for uci, san, cp in st.session_state.suggestions:
         eval_txt = "mate/unknown" if cp is None else f"{cp:+d} cp"
-        if st.button("f{san} ({eval_txt})", key=f"sug_{uci}"):
+        if st.button(f"{san} ({eval_txt})", key=f"sug_{uci}"):
             m = chess.Move.from_uci(uci)
-            san = board.san(m) if m in board.legal_moves else uci
-            cp = None
             if m not in board.legal_moves:
                 st.error("Подсказка уже не актуальна (позиция изменилась).")
                 st.stop()
 
             board.push(m)
             st.session_state.last_move = m
-            st.session_state.log.append(f"Подсказка:: {san} ({uci})")
-
-            # авто-ответ движке
-            if auto_reply and not board.is_game_over():
-                engine, mode = require_engine(engine_path, elo)
-                limit = chess.engine.Limit(time=think_ms / 1000.0)
-                res = engine.play(board, limit)
-                em = res.move
-                es = board.san(m)
-                board.push(m)
-                st.session_state.last_move = em
-                st.session_state.log.append(f"{es} ({em.uci()}) [{mode}]")
+            st.session_state.log.append(f"💡 Подсказка: {san} ({uci})")
+
+            # авто-ответ движка
+            if auto_reply:
+                request_reply(board, engine_path, elo, think_ms)
             st.rerun()
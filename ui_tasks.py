@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import atexit
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import chess
+
+from chess_core import find_stockfish
+from engine_pool import WarmAnalyzer
+from suggestions import SuggestionPack
+
+# Фоновые задачи движка для ui_streamlit: скрипт только ставит задачу и
+# сохраняет Future в session_state, результат забирается на следующем rerun.
+
+
+class EngineTasks:
+    def __init__(self, workers: int = 2) -> None:
+        self.analyzer = WarmAnalyzer()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="engine")
+        # st.cache_resource сам объект не закрывает: гасим движки на выходе
+        atexit.register(self.close)
+
+    def suggest(
+        self,
+        fen: str,
+        engine_path: str | None,
+        elo: int,
+        think_ms: int,
+        k: int,
+    ) -> Future[SuggestionPack]:
+        # путь ищем сразу: ошибка "Stockfish не найден" видна без ожидания
+        path = find_stockfish(engine_path)
+        return self._executor.submit(self.analyzer.suggest, fen, path, elo, think_ms, k)
+
+    def reply(
+        self,
+        fen: str,
+        engine_path: str | None,
+        elo: int,
+        think_ms: int,
+    ) -> Future[tuple[str, chess.Move, str]]:
+        path = find_stockfish(engine_path)
+        return self._executor.submit(self.analyzer.play, fen, path, elo, think_ms)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.analyzer.close()